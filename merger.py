@@ -1,31 +1,38 @@
 #!/usr/bin/env python3
 import argparse
+import csv
 import os
 import sys
 import re
-import pandas as pd
+from functools import lru_cache
+import numpy as np
+from openpyxl import load_workbook
+from openpyxl.cell.cell import ERROR_CODES
+
+WS_RE = re.compile(r"\s+", flags=re.UNICODE)
+
+@lru_cache(maxsize=1024)
+def _normalize_cached(name: str) -> str:
+    s = name.replace("\xa0", " ")
+    s = WS_RE.sub(" ", s)
+    return s.strip().lower()
 
 def normalize_header(name: str) -> str:
+    # Coerce first so only hashable strings reach the cache.
     if not isinstance(name, str):
         name = str(name) if name is not None else ""
-    s = name.replace("\xa0", " ")
-    s = re.sub(r"\s+", " ", s, flags=re.UNICODE)
-    return s.strip().lower()
+    return _normalize_cached(name)
 
 def find_revenue_cashflow_indices(columns):
-    norm = [normalize_header(c) for c in columns]
-    def match_rev(s): return s == "revenue"
-    def match_cf(s): return s == "cash flow" or s == "cashflow"
+    norm_map = {}
+    for i, c in enumerate(columns):
+        norm_map.setdefault(normalize_header(c), i)
 
-    try:
-        start_idx = next(i for i, c in enumerate(norm) if match_rev(c))
-    except StopIteration:
-        return None
-
-    try:
-        end_idx = next(i for i, c in enumerate(norm) if match_cf(c))
-    except StopIteration:
+    start_idx = norm_map.get("revenue")
+    cf_idxs = [norm_map[k] for k in ("cash flow", "cashflow") if k in norm_map]
+    if start_idx is None or not cf_idxs:
         return None
+    end_idx = min(cf_idxs)
 
     if end_idx < start_idx:
         start_idx, end_idx = end_idx, start_idx
@@ -33,45 +40,165 @@ def find_revenue_cashflow_indices(columns):
 
 VIEW_RE = re.compile(r"\d{4}[ABF]")
 
-def detect_view_header_row(raw):
-    for r in range(raw.shape[0]):
-        row_views = {}
-        for c in range(raw.shape[1]):
-            val = raw.iat[r, c]
-            if isinstance(val, str) and VIEW_RE.fullmatch(val.strip()):
-                row_views[c] = val.strip()
-        if row_views:
-            return r, row_views
+def is_view_code(s):
+    # Four ASCII digits and A/B/F, without entering the regex engine per cell.
+    # isdigit() alone would accept digits like "²" that int() rejects.
+    s = s.strip()
+    year = s[:4]
+    return len(s) == 5 and year.isascii() and year.isdigit() and s[4] in "ABF"
+
+def is_view_cell(val):
+    return isinstance(val, str) and is_view_code(val)
+
+DETECT_BLOCK_ROWS = 64
+
+def detect_view_header_row(rows):
+    arr = np.asarray(rows, dtype=object)
+    if arr.ndim != 2 or arr.size == 0:
+        return None, {}
+    # Batched scans over blocks of rows, stopping at the first block with a
+    # view code: the header sits near the top, so the body is never scanned.
+    is_view = np.frompyfunc(is_view_cell, 1, 1)
+    for start in range(0, arr.shape[0], DETECT_BLOCK_ROWS):
+        mask = is_view(arr[start:start + DETECT_BLOCK_ROWS]).astype(bool)
+        rows_with_hits = np.flatnonzero(mask.any(axis=1))
+        if rows_with_hits.size:
+            hit = int(rows_with_hits[0])
+            r = start + hit
+            return r, {int(c): arr[r, c].strip() for c in np.flatnonzero(mask[hit])}
     return None, {}
 
-def collect_metric_rows(raw, header_row_idx, view_cols):
-    metric_rows = []
-    for r in range(header_row_idx + 1, raw.shape[0]):
-        label = None
-        if raw.shape[1] > 1 and isinstance(raw.iat[r, 1], str):
-            label = raw.iat[r, 1].strip()
-        elif isinstance(raw.iat[r, 0], str):
-            label = raw.iat[r, 0].strip()
-        if not label:
-            continue
-        row_has_num = any(pd.api.types.is_number(raw.iat[r, c]) for c in view_cols.keys())
-        if row_has_num:
-            metric_rows.append((r, label))
-    return metric_rows
-
-def build_flat_from_company_sheets(xlsx_path, month_fixed="December"):
-    xls = pd.ExcelFile(xlsx_path)
-    records = []
-
-    for sheet in xls.sheet_names:
-        raw = pd.read_excel(xlsx_path, sheet_name=sheet, header=None)
-        header_row_idx, view_cols = detect_view_header_row(raw)
-        if not view_cols:
-            continue
-
-        metric_rows = collect_metric_rows(raw, header_row_idx, view_cols)
-
-        for c, view in view_cols.items():
+def is_num(val):
+    # Cells are plain Python scalars here; type() also keeps bools out.
+    return type(val) is float or type(val) is int
+
+def is_str_cell(val):
+    return isinstance(val, str)
+
+def strip_label(val):
+    return val.strip() if isinstance(val, str) else ""
+
+def collect_metric_rows(rows, header_row_idx, view_cols):
+    arr = np.asarray(rows, dtype=object)
+    ncols = arr.shape[1]
+    view_col_list = list(view_cols)
+    body = arr[header_row_idx + 1:]
+    if body.shape[0] == 0:
+        return []
+    # Label lives in column B when it is text there, otherwise in column A.
+    raw_labels = body[:, 0]
+    if ncols > 1:
+        raw_labels = np.where(np.frompyfunc(is_str_cell, 1, 1)(body[:, 1]).astype(bool), body[:, 1], raw_labels)
+    labels = np.frompyfunc(strip_label, 1, 1)(raw_labels)
+    num_mask = np.frompyfunc(is_num, 1, 1)(body[:, view_col_list]).astype(bool)
+    valid = np.flatnonzero(num_mask.any(axis=1) & labels.astype(bool))
+    return [(header_row_idx + 1 + int(i), labels[i]) for i in valid]
+
+# Blank and error cells are read as NaN, as pd.read_excel reported them: NaN
+# passes the numeric test, so labelled rows and views with blanks keep their
+# (empty) place in the output. Every reader must use this same value.
+BLANK = float("nan")
+
+def read_cell(val):
+    return BLANK if val is None or val in ERROR_CODES else val
+
+def read_rows_openpyxl(xlsx_path):
+    # Streaming read-only mode: no cell objects, memory bounded by file size.
+    wb = load_workbook(xlsx_path, read_only=True, data_only=True)
+    try:
+        sheets = {}
+        for ws in wb.worksheets:
+            # Don't trust the stored <dimension>; it can be stale or truncated.
+            ws.reset_dimensions()
+            rows = [[read_cell(v) for v in row] for row in ws.iter_rows(values_only=True)]
+            width = max((len(row) for row in rows), default=0)
+            sheets[ws.title] = [row + [BLANK] * (width - len(row)) for row in rows]
+        return sheets
+    finally:
+        wb.close()
+
+def read_workbook(xlsx_path):
+    # One pass over the whole workbook: {sheet name: list of rows}. The
+    # detection and extraction steps only index cells, so no DataFrame is built.
+    try:
+        from python_calamine import CalamineWorkbook
+    except ImportError:
+        return read_rows_openpyxl(xlsx_path)
+    wb = CalamineWorkbook.from_path(xlsx_path)
+    sheets = {}
+    for name in wb.sheet_names:
+        # Keep empty leading rows/columns so index 0/1 stay columns A/B, and map
+        # calamine's "" (blank and error cells) to BLANK like the openpyxl reader.
+        rows = wb.get_sheet_by_name(name).to_python(skip_empty_area=False)
+        sheets[name] = [[BLANK if v == "" else v for v in row] for row in rows]
+    return sheets
+
+ID_COLS = ["Company Name", "Year", "Month", "Version", "View"]
+
+def process_sheet(sheet, rows):
+    # Every (sheet, view, [(label, value)]) entry in one sheet.
+    raw = np.array(rows, dtype=object)
+    header_row_idx, view_cols = detect_view_header_row(raw)
+    if not view_cols:
+        return []
+
+    metric_rows = collect_metric_rows(raw, header_row_idx, view_cols)
+    # Skipped labels depend only on the sheet, not the view: drop them once.
+    kept_metric_rows = [
+        (r, label) for r, label in metric_rows
+        if "includes depreciation" not in normalize_header(label)
+    ]
+
+    found = []
+    for c, view in view_cols.items():
+        # 1-D column view: col[r] skips the 2-D index tuple on every lookup.
+        col = raw[:, c]
+        values = [(label, float(col[r])) for r, label in kept_metric_rows if is_num(col[r])]
+        if values:
+            found.append((sheet, view, values))
+    return found
+
+def scan_company_sheets(sheets):
+    # Find every (sheet, view) with values and the union of labels, in
+    # first-seen order, so the output columns are known before any row is built.
+    # Once Revenue and Cash Flow have both been seen the range is fixed (later
+    # labels can only land after it), so out-of-range values are dropped as the
+    # scan goes rather than held in `pending` until the write.
+    pending = []
+    labels = {}
+    keep = None
+    for sheet, rows in sheets.items():
+        for name, view, values in process_sheet(sheet, rows):
+            if keep is None:
+                for label, _ in values:
+                    labels.setdefault(label, None)
+                columns = select_output_columns(list(labels))
+                if columns is not None:
+                    keep = set(columns)
+                    labels = dict.fromkeys(columns[len(ID_COLS):])
+                    pending = [(n, v, [lv for lv in vals if lv[0] in keep]) for n, v, vals in pending]
+            if keep is not None:
+                values = [lv for lv in values if lv[0] in keep]
+            pending.append((name, view, values))
+
+    return pending, list(labels)
+
+def select_output_columns(labels):
+    # Id columns plus metrics up to Cash Flow, or None if either end is missing.
+    columns = ID_COLS + labels
+    idxs = find_revenue_cashflow_indices(columns)
+    if idxs is None:
+        return None
+    start_idx, end_idx = idxs
+    return columns[:start_idx] + columns[start_idx:end_idx + 1]
+
+def write_flat_csv(pending, columns, output_csv, month_fixed="December"):
+    # Stream one row per (sheet, view) straight to disk, keeping only `columns`.
+    keep = set(columns)
+    with open(output_csv, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=columns, lineterminator=os.linesep)
+        writer.writeheader()
+        for sheet, view, values in pending:
             row = {
                 "Company Name": sheet,
                 "Year": int(view[:4]),
@@ -79,26 +206,11 @@ def build_flat_from_company_sheets(xlsx_path, month_fixed="December"):
                 "Version": view[-1],
                 "View": view,
             }
-            any_val = False
-
-            for r, label in metric_rows:
-                if "includes depreciation" in normalize_header(label):
-                    continue
-                val = raw.iat[r, c]
-                if pd.api.types.is_number(val):
-                    row[label] = float(val)
-                    any_val = True
-
-            if any_val:
-                records.append(row)
-
-    if not records:
-        return pd.DataFrame()
-
-    df = pd.DataFrame(records)
-    id_cols = ["Company Name", "Year", "Month", "Version", "View"]
-    metric_cols = [c for c in df.columns if c not in id_cols]
-    return df[id_cols + metric_cols]
+            for label, val in values:
+                # NaN is a blank cell: the column stays, the field is left empty.
+                if label in keep and val == val:
+                    row[label] = val
+            writer.writerow(row)
 
 def build_output_csv_path(input_path):
     base, _ = os.path.splitext(input_path)
@@ -123,22 +235,19 @@ def main():
         print(f"Error: File '{input_path}' not found.")
         sys.exit(1)
 
-    df_work = build_flat_from_company_sheets(input_path, month_fixed="December")
-    if df_work.empty:
+    sheets = read_workbook(input_path)
+    pending, labels = scan_company_sheets(sheets)
+    if not pending:
         print("Error: No view codes (e.g., 2024B/2024F) found in workbook.")
         sys.exit(1)
 
-    idxs = find_revenue_cashflow_indices(df_work.columns)
-    if idxs is None:
+    cols_to_keep = select_output_columns(labels)
+    if cols_to_keep is None:
         print("Error: 'Revenue' or 'Cash Flow' not found.")
         sys.exit(1)
 
-    start_idx, end_idx = idxs
-    cols_to_keep = list(df_work.columns[:start_idx]) + list(df_work.columns[start_idx:end_idx + 1])
-    df_final = df_work[cols_to_keep]
-
     output_csv = build_output_csv_path(input_path)
-    df_final.to_csv(output_csv, index=False)
+    write_flat_csv(pending, cols_to_keep, output_csv, month_fixed="December")
 
     print(f"Processed: {input_path}")
     print(f"Wrote CSV: {output_csv}")
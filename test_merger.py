@@ -0,0 +1,240 @@
+import re
+import zipfile
+
+import pytest
+from openpyxl import Workbook
+
+import merger
+
+
+@pytest.fixture(params=["calamine", "openpyxl"])
+def reader(request):
+    if request.param == "calamine":
+        pytest.importorskip("python_calamine")
+        return merger.read_workbook
+    return merger.read_rows_openpyxl
+
+
+def make_workbook(path, sheets):
+    # sheets: {name: {"A1": value, ...}}
+    wb = Workbook()
+    wb.remove(wb.active)
+    for name, cells in sheets.items():
+        ws = wb.create_sheet(name)
+        for ref, value in cells.items():
+            ws[ref] = value
+    wb.save(path)
+    return path
+
+
+def run(tmp_path, reader, sheets):
+    xlsx = make_workbook(tmp_path / "in.xlsx", sheets)
+    pending, labels = merger.scan_company_sheets(reader(xlsx))
+    columns = merger.select_output_columns(labels)
+    assert columns is not None
+    out = tmp_path / "out.csv"
+    merger.write_flat_csv(pending, columns, out)
+    return out.read_text(encoding="utf-8").splitlines()
+
+
+def test_empty_column_a_and_text_column(tmp_path, reader):
+    lines = run(tmp_path, reader, {
+        "Co": {
+            "D2": "2024B", "E2": "2024F",
+            "B3": "Revenue", "C3": "USD", "D3": 100, "E3": 110,
+            "B4": "Cash Flow", "C4": "USD", "D4": 60, "E4": 70,
+        },
+    })
+    assert lines == [
+        "Company Name,Year,Month,Version,View,Revenue,Cash Flow",
+        "Co,2024,December,B,2024B,100.0,60.0",
+        "Co,2024,December,F,2024F,110.0,70.0",
+    ]
+
+
+def test_label_in_column_a_when_b_is_not_text(tmp_path, reader):
+    lines = run(tmp_path, reader, {
+        "Co": {
+            "B1": "2023A", "C1": "2024F",
+            "A2": "Revenue", "B2": 10, "C2": 20,
+            "A3": "Cash Flow", "B3": 1, "C3": 2,
+        },
+    })
+    assert lines == [
+        "Company Name,Year,Month,Version,View,Revenue,Cash Flow",
+        "Co,2023,December,A,2023A,10.0,1.0",
+        "Co,2024,December,F,2024F,20.0,2.0",
+    ]
+
+
+def test_blank_cells_keep_rows_and_columns(tmp_path, reader):
+    # Blank view cells count like the NaN pd.read_excel produced: a labelled
+    # row with no values is still a column, a view with no values still a row.
+    lines = run(tmp_path, reader, {
+        "Société": {
+            "C1": "2024B", "D1": "2025B",
+            "B2": "Revenue", "C2": 100,
+            "B3": "Memo section",
+            "B4": "Coût €", "C4": 40,
+            "B5": "Cash Flow", "C5": 60,
+        },
+    })
+    assert lines == [
+        "Company Name,Year,Month,Version,View,Revenue,Memo section,Coût €,Cash Flow",
+        "Société,2024,December,B,2024B,100.0,,40.0,60.0",
+        "Société,2025,December,B,2025B,,,,",
+    ]
+
+
+def test_error_cells_read_as_blank(tmp_path, reader):
+    # pandas mapped error cells to NaN: a view of errors is still a row, and an
+    # error in column B does not hide the label in column A.
+    lines = run(tmp_path, reader, {
+        "Co": {
+            "C1": "2024B", "D1": "2024F",
+            "A2": "Revenue", "B2": "#REF!", "C2": 100, "D2": "#DIV/0!",
+            "A3": "Cash Flow", "C3": 60, "D3": "#N/A",
+        },
+    })
+    assert lines == [
+        "Company Name,Year,Month,Version,View,Revenue,Cash Flow",
+        "Co,2024,December,B,2024B,100.0,60.0",
+        "Co,2024,December,F,2024F,,",
+    ]
+
+
+def test_stale_dimension_tag_is_ignored(tmp_path, reader):
+    sheets = {"Co": {"C1": "2024B", "B2": "Revenue", "C2": 1, "B3": "Cash Flow", "C3": 2}}
+    xlsx = make_workbook(tmp_path / "in.xlsx", sheets)
+    stale = tmp_path / "stale.xlsx"
+    with zipfile.ZipFile(xlsx) as zin, zipfile.ZipFile(stale, "w") as zout:
+        for item in zin.infolist():
+            data = zin.read(item.filename)
+            if item.filename.startswith("xl/worksheets/"):
+                data = re.sub(rb'<dimension ref="[^"]*"\s*/>', b'<dimension ref="A1"/>', data)
+            zout.writestr(item, data)
+    pending, labels = merger.scan_company_sheets(reader(stale))
+    assert merger.select_output_columns(labels) == merger.ID_COLS + ["Revenue", "Cash Flow"]
+    assert [(view, values) for _, view, values in pending] == [("2024B", [("Revenue", 1.0), ("Cash Flow", 2.0)])]
+
+
+def test_bool_cells_are_not_metric_values(tmp_path, reader):
+    # Deliberate change from pd.api.types.is_number, which counted True as 1.0.
+    lines = run(tmp_path, reader, {
+        "Co": {
+            "C1": "2024B",
+            "B2": "Revenue", "C2": 100,
+            "B3": "Audited", "C3": True,
+            "B4": "Cash Flow", "C4": 60,
+        },
+    })
+    assert lines == [
+        "Company Name,Year,Month,Version,View,Revenue,Cash Flow",
+        "Co,2024,December,B,2024B,100.0,60.0",
+    ]
+
+
+def test_includes_depreciation_is_skipped(tmp_path, reader):
+    lines = run(tmp_path, reader, {
+        "Co": {
+            "C1": "2024B",
+            "B2": "Revenue", "C2": 100,
+            "B3": "  Includes   Depreciation ", "C3": 5,
+            "B4": "Cash Flow", "C4": 60,
+        },
+    })
+    assert lines == [
+        "Company Name,Year,Month,Version,View,Revenue,Cash Flow",
+        "Co,2024,December,B,2024B,100.0,60.0",
+    ]
+
+
+def test_keeps_metrics_through_cash_flow_only(tmp_path, reader):
+    lines = run(tmp_path, reader, {
+        "Co": {
+            "C1": "2024B",
+            "B2": "Units", "C2": 3,
+            "B3": "Revenue", "C3": 100,
+            "B4": "CashFlow", "C4": 60,
+            "B5": "Capex Memo", "C5": 9,
+        },
+    })
+    assert lines == [
+        "Company Name,Year,Month,Version,View,Units,Revenue,CashFlow",
+        "Co,2024,December,B,2024B,3.0,100.0,60.0",
+    ]
+
+
+def test_cash_flow_before_revenue(tmp_path, reader):
+    lines = run(tmp_path, reader, {
+        "Co": {
+            "C1": "2024B",
+            "B2": "Cash Flow", "C2": 60,
+            "B3": "Revenue", "C3": 100,
+            "B4": "Other", "C4": 1,
+        },
+    })
+    assert lines == [
+        "Company Name,Year,Month,Version,View,Cash Flow,Revenue",
+        "Co,2024,December,B,2024B,60.0,100.0",
+    ]
+
+
+def test_labels_union_across_sheets_in_first_seen_order(tmp_path, reader):
+    lines = run(tmp_path, reader, {
+        "A": {"C1": "2024B", "B2": "Revenue", "C2": 1, "B3": "Cash Flow", "C3": 2},
+        "B": {"C1": "2024F", "B2": "Revenue", "C2": 3, "B3": "Gross Margin", "C3": 4,
+              "B4": "Cash Flow", "C4": 5},
+        "Notes": {"A1": "no view codes here"},
+    })
+    assert lines == [
+        "Company Name,Year,Month,Version,View,Revenue,Cash Flow",
+        "A,2024,December,B,2024B,1.0,2.0",
+        "B,2024,December,F,2024F,3.0,5.0",
+    ]
+
+
+def test_range_fixed_by_a_later_sheet(tmp_path, reader):
+    lines = run(tmp_path, reader, {
+        "A": {"C1": "2024B", "B2": "Revenue", "C2": 1, "B3": "Units", "C3": 2},
+        "B": {"C1": "2024F", "B2": "Cash Flow", "C2": 3, "B3": "Capex Memo", "C3": 4},
+    })
+    assert lines == [
+        "Company Name,Year,Month,Version,View,Revenue,Units,Cash Flow",
+        "A,2024,December,B,2024B,1.0,2.0,",
+        "B,2024,December,F,2024F,,,3.0",
+    ]
+
+
+@pytest.mark.parametrize("sheets, message", [
+    ({"Co": {"B2": "Revenue", "C2": 1}}, "No view codes"),
+    ({"Co": {"C1": "2024B", "B2": "Revenue", "C2": 1}}, "'Revenue' or 'Cash Flow' not found"),
+])
+def test_main_error_exits(tmp_path, reader, monkeypatch, capsys, sheets, message):
+    xlsx = make_workbook(tmp_path / "in.xlsx", sheets)
+    monkeypatch.setattr(merger, "read_workbook", reader)
+    monkeypatch.setattr("sys.argv", ["merger.py", "-i", str(xlsx)])
+    with pytest.raises(SystemExit) as exc:
+        merger.main()
+    assert exc.value.code == 1
+    assert message in capsys.readouterr().out
+    assert not (tmp_path / "in.csv").exists()
+
+
+def test_find_revenue_cashflow_indices_prefers_first_cash_flow():
+    assert merger.find_revenue_cashflow_indices(["Revenue", "x", "CashFlow", "Cash Flow"]) == (0, 2)
+    assert merger.find_revenue_cashflow_indices(["Revenue", "Cash  Flow", "cashflow"]) == (0, 1)
+    assert merger.find_revenue_cashflow_indices(["Revenue", "x"]) is None
+
+
+def test_normalize_header_non_string_input():
+    assert merger.normalize_header(None) == ""
+    assert merger.normalize_header(2024) == "2024"
+    assert merger.normalize_header(1.5) == "1.5"
+    assert merger.normalize_header(" Cash\xa0 Flow ") == "cash flow"
+
+
+def test_is_view_code_rejects_non_ascii_digits():
+    assert merger.is_view_code(" 2024F ")
+    assert not merger.is_view_code("²024B")
+    assert not merger.is_view_code("2024C")